@@ -0,0 +1,289 @@
+# Multi-tenant agent profiles: which persona, voice, tools and calendars answer a given number / campaign
+from faq_index import load_faq_index
+from datetime import datetime, timezone
+import threading
+import asyncio
+import json
+import uuid
+import os
+
+# Tools offered to the agent unless a profile provides its own `selectedTools`
+DEFAULT_TOOLS = [
+    {
+        "temporaryTool": {
+            "modelToolName": "question_and_answer",
+            "description": "Get answers to customer questions especially about AI employees",
+            "dynamicParameters": [
+                {
+                    "name": "question",
+                    "location": "PARAMETER_LOCATION_BODY",
+                    "schema": {
+                        "type": "string",
+                        "description": "Question to be answered"
+                    },
+                    "required": True
+                }
+            ],
+            "timeout": "20s",
+            "client": {},
+        },
+    },
+    {
+        "temporaryTool": {
+            "modelToolName": "schedule_meeting",
+            "description": "Schedule a meeting for a customer. Returns a message indicating whether the booking was successful or not.",
+            "dynamicParameters": [
+                {
+                    "name": "name",
+                    "location": "PARAMETER_LOCATION_BODY",
+                    "schema": {
+                        "type": "string",
+                        "description": "Customer's name"
+                    },
+                    "required": True
+                },
+                {
+                    "name": "email",
+                    "location": "PARAMETER_LOCATION_BODY",
+                    "schema": {
+                        "type": "string",
+                        "description": "Customer's email"
+                    },
+                    "required": True
+                },
+                {
+                    "name": "purpose",
+                    "location": "PARAMETER_LOCATION_BODY",
+                    "schema": {
+                        "type": "string",
+                        "description": "Purpose of the Meeting"
+                    },
+                    "required": True
+                },
+                {
+                    "name": "datetime",
+                    "location": "PARAMETER_LOCATION_BODY",
+                    "schema": {
+                        "type": "string",
+                        "description": "Meeting Datetime"
+                    },
+                    "required": True
+                },
+                {
+                    "name": "location",
+                    "location": "PARAMETER_LOCATION_BODY",
+                    "schema": {
+                        "type": "string",
+                        "enum": ["London", "Manchester", "Brighton"],
+                        "description": "Meeting location"
+                    },
+                    "required": True
+                }
+            ],
+            "timeout": "20s",
+            "client": {},
+        },
+    },
+    { "temporaryTool": {
+        "modelToolName": "hangUp",
+        "description": "End the call",
+        "client": {},
+        }
+    }
+]
+
+# How often (seconds) the registry stats its files to pick up edits
+RELOAD_CHECK_INTERVAL = 2.0
+
+
+class AgentProfile:
+    """
+    One agent configuration, with its Ultravox create-call body serialized once.
+    Only the current time (`{now}` in the system prompt) and the first message
+    are spliced in per call.
+    """
+
+    def __init__(self, name: str, config: dict, medium: dict, faq_index=None):
+        self.name = name
+        self.faq_index = faq_index      # This tenant's local FAQ, or None to always ask Pinecone
+        self.numbers = [str(n).replace(" ", "") for n in config.get("numbers", [])]
+        self.campaigns = list(config.get("campaigns", []))
+        self.calendars = dict(config.get("calendars", {}))
+        self.first_message = config.get("firstMessage", "")
+
+        # Serialize with a unique marker where the first message goes, then split
+        # the JSON around the markers so rendering is just a join
+        marker = f"@@{uuid.uuid4().hex}@@"
+        payload = {
+            "systemPrompt": config.get("systemPrompt", ""),
+            "model": config["model"],
+            "voice": config["voice"],
+            "temperature": config.get("temperature", 0.1),
+            "initialMessages": [
+                {
+                    "role": "MESSAGE_ROLE_USER",
+                    "text": marker
+                }
+            ],
+            "medium": medium,
+            "selectedTools": config.get("selectedTools", DEFAULT_TOOLS)
+        }
+        before, after = json.dumps(payload).split(marker)
+        self._parts = [p.split("{now}") for p in (before, after)]
+
+    def render(self, first_message: str) -> bytes:
+        """
+        Returns the JSON body for POST /api/calls.
+        """
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        message = json.dumps(first_message)[1:-1]
+        before, after = (now.join(p) for p in self._parts)
+        return (before + message + after).encode("utf-8")
+
+
+class ProfileRegistry:
+    """
+    Loads agent profiles from a JSON file and re-reads it (and any referenced
+    prompt files) when they change on disk, without a restart.
+
+    File format:
+        {
+          "default": "agenix",
+          "profiles": {
+            "agenix": {
+              "numbers": ["+441234567890"],
+              "campaigns": ["spring-outreach"],
+              "model": "fixie-ai/ultravox-70B",
+              "voice": "Tanya-English",
+              "systemPromptFile": "prompts/agenix.txt",
+              "faqFile": "faq.json",
+              "firstMessage": "...",
+              "calendars": {"London": "london@example.com"}
+            }
+          }
+        }
+    `systemPrompt` may be given inline instead of `systemPromptFile` (a path relative
+    to the profiles file). `faqFile` (also relative) is the profile's own local FAQ;
+    profiles without one, or whose file doesn't exist yet, skip straight to Pinecone.
+    Keys missing from a profile fall back to `defaults`.
+    """
+
+    def __init__(self, path: str, defaults: dict, medium: dict):
+        self.path = path
+        self.defaults = defaults
+        self.medium = medium
+        self.profiles = {}
+        self.default_name = "default"
+        self._lookup = ({}, {}, {}, None)     # (by campaign, by name, by number, default), swapped in one go
+        self._mtimes = {}
+        self.faq_errors = {}
+        self._load_lock = threading.Lock()
+        self.load()
+
+    def load(self) -> bool:
+        """
+        (Re)build all profiles and their FAQ indexes. Blocking: off the event loop,
+        call it through asyncio.to_thread. On a bad profiles or prompt
+        file the previous profiles stay active and this returns False. A bad FAQ
+        file only affects its own profile, which keeps its previous index (none on
+        first load); the error is kept in `faq_errors`.
+        """
+        with self._load_lock:   # The watcher and /admin/faq/reload may both call this
+            return self._load()
+
+    def _load(self) -> bool:
+        try:
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    config = json.load(f)
+            else:
+                config = {}
+            watched = {self.path: self._mtime(self.path)}
+
+            profiles_config = config.get("profiles") or {"default": {}}
+            default_name = config.get("default") or next(iter(profiles_config))
+            profiles, by_number, by_campaign, faq_errors = {}, {}, {}, {}
+            base_dir = os.path.dirname(os.path.abspath(self.path))
+            for name, overrides in profiles_config.items():
+                merged = {**self.defaults, **overrides}
+                prompt_file = merged.pop("systemPromptFile", None)
+                if prompt_file:
+                    prompt_path = os.path.join(base_dir, prompt_file)
+                    with open(prompt_path) as f:
+                        merged["systemPrompt"] = f.read()
+                    watched[prompt_path] = self._mtime(prompt_path)
+                faq_file = merged.pop("faqFile", None)
+                faq_index = None
+                if faq_file:
+                    faq_path = os.path.join(base_dir, faq_file)
+                    watched[faq_path] = self._mtime(faq_path)   # Also picks the file up once it's created
+                    try:
+                        faq_index = load_faq_index(faq_path)
+                    except Exception as e:
+                        previous = self.profiles.get(name)
+                        faq_index = previous.faq_index if previous else None
+                        faq_errors[name] = f"{faq_path}: {e}"
+                        print(f"Error building FAQ index for profile '{name}' from {faq_path}: {e} "
+                              f"({'keeping the previous index' if faq_index else 'FAQ tier disabled'})")
+                profile = AgentProfile(name, merged, self.medium, faq_index)
+                profiles[name] = profile
+                for number in profile.numbers:
+                    by_number[number] = profile
+                for campaign in profile.campaigns:
+                    by_campaign[campaign] = profile
+
+            if default_name not in profiles:
+                raise ValueError(f"Default profile '{default_name}' is not defined")
+        except Exception as e:
+            print(f"Error loading agent profiles from {self.path}: {e}")
+            if not self.profiles:
+                raise
+            return False
+
+        self.profiles = profiles
+        self.default_name = default_name
+        self._lookup = (by_campaign, profiles, by_number, profiles[default_name])
+        self._mtimes = watched
+        self.faq_errors = faq_errors
+        print(f"Loaded agent profiles: {', '.join(profiles)} (default: {default_name})")
+        return True
+
+    def select(self, number: str = None, campaign: str = None) -> AgentProfile:
+        """
+        Pick the profile for a campaign, else for the Twilio number, else the default.
+        Only dict lookups, so it is safe on the event loop; `watch()` does the reloading.
+        """
+        by_campaign, by_name, by_number, default = self._lookup
+        if campaign and campaign in by_campaign:
+            return by_campaign[campaign]
+        if campaign and campaign in by_name:
+            return by_name[campaign]
+        if number:
+            profile = by_number.get(number.replace(" ", ""))
+            if profile:
+                return profile
+        return default
+
+    async def watch(self):
+        """
+        Reload whenever the profiles file or a file it references changes. Run as a
+        task; the stat calls and the reload happen on a worker thread.
+        """
+        while True:
+            await asyncio.sleep(RELOAD_CHECK_INTERVAL)
+            try:
+                if await asyncio.to_thread(self._changed):
+                    print("Agent profiles changed on disk, reloading...")
+                    await asyncio.to_thread(self.load)
+            except Exception as e:
+                print(f"Error reloading agent profiles: {e}")
+
+    def _changed(self) -> bool:
+        return any(self._mtime(path) != mtime for path, mtime in self._mtimes.items())
+
+    @staticmethod
+    def _mtime(path: str):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
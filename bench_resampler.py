@@ -0,0 +1,76 @@
+#
+# Per-call CPU cost of the Twilio <-> Ultravox audio path at different Ultravox sample rates.
+#
+# Usage:
+#   python bench_resampler.py                       # 8000, 16000, 24000 for a 60s call
+#   python bench_resampler.py --rates 16000 48000 --seconds 300
+#
+import argparse
+import audioop
+import time
+import numpy as np
+from resampler import PolyphaseResampler
+
+TWILIO_SAMPLE_RATE = 8000
+FRAME_MS = 20   # Twilio sends (and we send back) 20ms media frames
+
+
+def make_speechlike(rate: int, seconds: float) -> bytes:
+    """
+    A few harmonics with a slow amplitude envelope, so the filter sees realistic content.
+    """
+    t = np.arange(int(rate * seconds)) / rate
+    signal = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((180, 360, 720, 1400, 2800)))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+    return (6000 * signal * envelope).astype(np.int16).tobytes()
+
+
+def frames(pcm: bytes, rate: int):
+    size = rate * FRAME_MS // 1000 * 2
+    return [pcm[i:i + size] for i in range(0, len(pcm), size)]
+
+
+def run_call(ultravox_rate: int, seconds: float) -> float:
+    """
+    Push one call's worth of audio through both directions and return the CPU seconds spent.
+    """
+    inbound = [audioop.lin2ulaw(f, 2) for f in frames(make_speechlike(TWILIO_SAMPLE_RATE, seconds), TWILIO_SAMPLE_RATE)]
+    outbound = frames(make_speechlike(ultravox_rate, seconds), ultravox_rate)
+
+    to_ultravox = None
+    to_twilio = None
+    if ultravox_rate != TWILIO_SAMPLE_RATE:
+        to_ultravox = PolyphaseResampler(TWILIO_SAMPLE_RATE, ultravox_rate)
+        to_twilio = PolyphaseResampler(ultravox_rate, TWILIO_SAMPLE_RATE)
+
+    start = time.process_time()
+    for mu_law_bytes in inbound:
+        pcm_bytes = audioop.ulaw2lin(mu_law_bytes, 2)
+        if to_ultravox:
+            pcm_bytes = to_ultravox.process(pcm_bytes)
+    for pcm_bytes in outbound:
+        if to_twilio:
+            pcm_bytes = to_twilio.process(pcm_bytes)
+        audioop.lin2ulaw(pcm_bytes, 2)
+    return time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call CPU cost of the Twilio <-> Ultravox audio path")
+    parser.add_argument("--rates", type=int, nargs="+", default=[8000, 16000, 24000])
+    parser.add_argument("--seconds", type=float, default=60.0, help="simulated call length")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per rate; the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"Simulated call: {args.seconds:.0f}s, {FRAME_MS}ms frames in both directions\n")
+    print(f"{'rate':>7}  {'CPU ms/call':>12}  {'CPU ms/min':>11}  {'% of a core':>11}  {'calls/core':>10}")
+    for rate in args.rates:
+        cpu = min(run_call(rate, args.seconds) for _ in range(args.repeat))
+        core_share = cpu / args.seconds
+        calls_per_core = int(1 / core_share) if core_share else float("inf")
+        print(f"{rate:>7}  {cpu * 1000:>12.1f}  {cpu * 60000 / args.seconds:>11.1f}  "
+              f"{core_share * 100:>10.3f}%  {calls_per_core:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#
+# Cold-start costs: module import time and first-request latency to each outbound host.
+#
+# Usage:
+#   python bench_startup.py               # 5 import runs, plus network probes if reachable
+#   python bench_startup.py --runs 10 --skip-network
+#
+import subprocess
+import statistics
+import argparse
+import requests
+import sys
+import os
+import time
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import main
+{extra}
+print(time.perf_counter() - start)
+"""
+
+# What main.py used to import eagerly at module load
+EAGER_SDKS = "import twilio.rest, pinecone, pinecone_plugins.assistant.models.chat"
+
+
+def time_import(extra: str, runs: int) -> float:
+    """
+    Median wall time (ms) to import main in a fresh interpreter, with `extra` imports timed too.
+    """
+    env = {**os.environ, "WARM_START": "false"}
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET.format(extra=extra)],
+            capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        if out.returncode != 0:
+            raise RuntimeError(out.stderr)
+        samples.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+    return statistics.median(samples)
+
+
+def time_request(session, url: str) -> float:
+    start = time.perf_counter()
+    session.head(url, timeout=10)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import time and first-request latency")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per import measurement")
+    parser.add_argument("--skip-network", action="store_true", help="only measure import time")
+    args = parser.parse_args()
+
+    lazy = time_import("", args.runs)
+    eager = time_import(EAGER_SDKS, args.runs)
+    print("=== Import time (median of %d fresh interpreters) ===" % args.runs)
+    print(f"  before (SDKs imported at load): {eager:8.1f} ms")
+    print(f"  after  (SDKs imported lazily):  {lazy:8.1f} ms")
+    print(f"  saved:                          {eager - lazy:8.1f} ms\n")
+
+    if args.skip_network:
+        return
+
+    # First request on a cold session pays DNS + TCP + TLS; after warm-up the pooled
+    # connection is reused, which is what the first real call then sees.
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main as app_main
+    urls = {
+        "ultravox": app_main.ULTRAVOX_API_URL,
+        "n8n": app_main.N8N_WEBHOOK_URL,
+        "twilio": app_main.TWILIO_API_URL,
+        "pinecone": app_main.PINECONE_API_URL,
+    }
+    print("=== First request latency (HEAD to host root) ===")
+    print(f"  {'host':<10} {'cold ms':>9} {'warm ms':>9}")
+    for name, url in urls.items():
+        host = app_main.warmup.hostname(url)
+        if not host:
+            print(f"  {name:<10} {'not configured':>19}")
+            continue
+        root = f"https://{host}/"
+        session = requests.Session()
+        try:
+            cold = time_request(session, root)
+            warm = time_request(session, root)
+            print(f"  {name:<10} {cold:9.1f} {warm:9.1f}")
+        except requests.exceptions.RequestException as e:
+            print(f"  {name:<10} unreachable: {e.__class__.__name__}")
+
+    if app_main.PINECONE_API_KEY:
+        # Building the assistant handle is a describe round trip the old code paid on every question
+        start = time.perf_counter()
+        try:
+            app_main.get_pinecone_assistant()
+            print(f"\n  Pinecone assistant handle: {(time.perf_counter() - start) * 1000:.1f} ms (now once per process)")
+        except Exception as e:
+            print(f"\n  Pinecone assistant handle failed: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# Local call log: Twilio status callbacks and media-stream session times in SQLite, written behind in batches
+from datetime import datetime, timezone
+from collections import deque
+import threading
+import sqlite3
+import asyncio
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS call_events (
+    id INTEGER PRIMARY KEY,
+    call_sid TEXT NOT NULL,
+    event TEXT NOT NULL,
+    status TEXT,
+    duration INTEGER,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS call_events_by_call ON call_events (call_sid, at);
+
+CREATE TABLE IF NOT EXISTS calls (
+    call_sid TEXT PRIMARY KEY,
+    direction TEXT,
+    from_number TEXT,
+    to_number TEXT,
+    profile TEXT,
+    status TEXT,
+    duration INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    answered_at REAL,
+    session_start REAL,
+    session_end REAL
+);
+CREATE INDEX IF NOT EXISTS calls_by_created ON calls (created_at);
+CREATE INDEX IF NOT EXISTS calls_by_status ON calls (status, created_at);
+"""
+
+# Twilio statuses after which a call can't change state; a late "ringing" mustn't overwrite them
+FINAL_STATUSES = ("completed", "busy", "failed", "no-answer", "canceled")
+
+UPSERT_CALL = f"""
+INSERT INTO calls (call_sid, direction, from_number, to_number, profile, status, duration,
+                   created_at, updated_at, answered_at, session_start, session_end)
+VALUES (:call_sid, :direction, :from_number, :to_number, :profile, :status, :duration,
+        :at, :at, :answered_at, :session_start, :session_end)
+ON CONFLICT (call_sid) DO UPDATE SET
+    direction = COALESCE(direction, excluded.direction),
+    from_number = COALESCE(from_number, excluded.from_number),
+    to_number = COALESCE(to_number, excluded.to_number),
+    profile = COALESCE(profile, excluded.profile),
+    status = CASE
+        WHEN excluded.status IS NULL THEN status
+        WHEN status IN {FINAL_STATUSES} AND excluded.status NOT IN {FINAL_STATUSES} THEN status
+        ELSE excluded.status END,
+    duration = COALESCE(excluded.duration, duration),
+    created_at = MIN(created_at, excluded.created_at),
+    updated_at = MAX(updated_at, excluded.updated_at),
+    answered_at = COALESCE(answered_at, excluded.answered_at),
+    session_start = COALESCE(session_start, excluded.session_start),
+    session_end = COALESCE(excluded.session_end, session_end)
+"""
+
+CALL_FIELDS = ("direction", "from_number", "to_number", "profile", "status", "duration")
+
+
+class CallLog:
+    """
+    `record()` only appends to an in-memory queue, so request handlers stay cheap.
+    A background task drains the queue every `flush_interval` seconds (sooner once
+    `batch_size` events are waiting) and writes each batch in one transaction on a
+    worker thread. Anything still queued is flushed on shutdown.
+    The database is opened in `start()`, so constructing one has no side effects.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, batch_size: int = 500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = deque()
+        self._wakeup = None
+        self._task = None
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._db = None
+
+    def record(self, call_sid: str, event: str, **fields):
+        """
+        Queue one event. `fields` may include direction, from_number, to_number, profile,
+        status and duration (seconds).
+        """
+        if not call_sid:
+            return
+        self._queue.append((call_sid, event, time.time(), fields))
+        if len(self._queue) >= self.batch_size and self._wakeup:
+            self._wakeup.set()
+
+    def start(self):
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Let the writer finish its current batch rather than cancelling it mid-write
+        self._stopping = True
+        if self._task:
+            self._wakeup.set()
+            await self._task
+        await self.flush()
+        with self._lock:
+            if self._db:
+                self._db.close()
+                self._db = None
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error writing call log batch: {e}")
+
+    async def flush(self):
+        batch = []
+        while self._queue:
+            batch.append(self._queue.popleft())
+        if batch:
+            await asyncio.to_thread(self._write, batch)
+
+    def _write(self, batch: list):
+        events, calls = [], []
+        for call_sid, event, at, fields in batch:
+            status = fields.get("status")
+            duration = fields.get("duration")
+            events.append((call_sid, event, status, duration, at))
+            answered_at = None
+            if status == "in-progress":
+                answered_at = at
+            elif status == "completed" and duration:
+                answered_at = at - duration
+            calls.append({
+                "call_sid": call_sid,
+                **{name: fields.get(name) for name in CALL_FIELDS},
+                "at": at,
+                "answered_at": answered_at,
+                "session_start": at if event == "session_start" else None,
+                "session_end": at if event == "session_end" else None,
+            })
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO call_events (call_sid, event, status, duration, at) VALUES (?, ?, ?, ?, ?)", events)
+            self._db.executemany(UPSERT_CALL, calls)
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    async def recent_calls(self, limit: int = 50, status: str = None) -> list:
+        """
+        Most recently created calls, newest first, optionally only those in `status`.
+        """
+        if status:
+            sql, params = "SELECT * FROM calls WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+        else:
+            sql, params = "SELECT * FROM calls ORDER BY created_at DESC LIMIT ?", (limit,)
+        rows = await asyncio.to_thread(self._query, sql, params)
+        for row in rows:
+            for key in ("created_at", "updated_at", "answered_at", "session_start", "session_end"):
+                row[key] = _iso(row[key])
+        return rows
+
+    async def stats(self, since: float, until: float) -> dict:
+        """
+        Throughput, answer rate and duration figures for calls created in [since, until).
+        """
+        rows = await asyncio.to_thread(self._query, """
+            SELECT direction, status, duration, answered_at, session_start, session_end
+            FROM calls WHERE created_at >= ? AND created_at < ?""", (since, until))
+
+        by_status, by_direction = {}, {}
+        for row in rows:
+            by_status[row["status"] or "unknown"] = by_status.get(row["status"] or "unknown", 0) + 1
+            by_direction[row["direction"] or "unknown"] = by_direction.get(row["direction"] or "unknown", 0) + 1
+        outbound = [row for row in rows if row["direction"] == "outbound"]
+        answered = [row for row in outbound if row["answered_at"] is not None]
+        durations = sorted(row["duration"] for row in rows if row["duration"])
+        sessions = sorted(row["session_end"] - row["session_start"] for row in rows
+                          if row["session_start"] and row["session_end"])
+        hours = max(until - since, 1) / 3600
+        return {
+            "since": _iso(since),
+            "until": _iso(until),
+            "calls": len(rows),
+            "callsPerHour": round(len(rows) / hours, 2),
+            "byDirection": by_direction,
+            "byStatus": by_status,
+            "outbound": {
+                "calls": len(outbound),
+                "answered": len(answered),
+                "answerRate": round(len(answered) / len(outbound), 3) if outbound else None,
+            },
+            "durationSeconds": _distribution(durations),
+            "sessionSeconds": _distribution(sessions),
+        }
+
+
+def _distribution(values: list) -> dict:
+    if not values:
+        return {"count": 0}
+    pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))], 1)
+    return {
+        "count": len(values),
+        "total": round(sum(values), 1),
+        "mean": round(sum(values) / len(values), 1),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "max": round(values[-1], 1),
+    }
+
+
+def _iso(ts: float):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts is not None else None
@@ -0,0 +1,111 @@
+# Opt-in recording of a call's Twilio / Ultravox event stream as compact JSONL, for replay.py
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import time
+import json
+import os
+
+RECORDING_FORMAT_VERSION = 1
+
+# Lines buffered in memory before they are handed to the writer thread
+FLUSH_EVERY = 500
+
+# One writer thread for all recorders: keeps each file's lines in order, keeps disk I/O off the event loop
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="call-recorder")
+
+
+class CallRecorder:
+    """
+    Records what `media_stream` sees for one call, one JSON object per line.
+    `t` is milliseconds since the Twilio WebSocket was accepted.
+
+        {"v": 1, "callSid": ..., "startedAt": ..., "inputSampleRate": ..., ...}   header
+        {"t": 12.5, "tw": "media", "p": "<base64 µ-law>"}                          Twilio media frame
+        {"t": 0.4, "tw": "start", "raw": {...}}                                    other Twilio events
+        {"t": 870.1, "uv": "open"}                                                 Ultravox WebSocket connected
+        {"t": 901.3, "uv": "audio", "n": 960}                                      Ultravox audio frame (byte count only)
+        {"t": 930.0, "uv": "msg", "raw": "{...}"}                                  Ultravox data message
+        {"t": 4020.7, "tool": "question_and_answer", "id": ..., "ms": 812.4}       tool round trip
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.call_sid = None
+        self.path = None
+        self._origin = time.perf_counter()
+        self._lines = []
+        self._header = {"v": RECORDING_FORMAT_VERSION}
+
+    def _now(self) -> float:
+        return round((time.perf_counter() - self._origin) * 1000, 1)
+
+    def _add(self, event: dict):
+        event["t"] = self._now()
+        self._lines.append(json.dumps(event, separators=(",", ":")))
+        if len(self._lines) >= FLUSH_EVERY:
+            self._flush()
+
+    def start(self, call_sid: str, **details):
+        """
+        Called on the Twilio `start` event; `details` go into the header (sample rates, numbers, profile).
+        """
+        self.call_sid = call_sid
+        self._header.update(callSid=call_sid, startedAt=datetime.now(timezone.utc).isoformat(), **details)
+
+    def twilio(self, data: dict):
+        event = data.get("event")
+        if event == "media":
+            self._add({"tw": "media", "p": data["media"]["payload"]})
+        else:
+            self._add({"tw": event, "raw": data})
+
+    def ultravox_open(self):
+        self._add({"uv": "open"})
+
+    def ultravox(self, raw_message):
+        if isinstance(raw_message, bytes):
+            self._add({"uv": "audio", "n": len(raw_message)})
+        else:
+            self._add({"uv": "msg", "raw": raw_message})
+
+    def tool(self, name: str, invocation_id: str, started: float):
+        """
+        Record a tool round trip that began at perf_counter() time `started`.
+        """
+        self._add({"tool": name, "id": invocation_id, "ms": round((time.perf_counter() - started) * 1000, 1)})
+
+    def _flush(self):
+        if self.path is None:
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+            self.path = os.path.join(self.directory, f"{stamp}-{self.call_sid or 'unknown'}.jsonl")
+            self._lines.insert(0, json.dumps(self._header, separators=(",", ":")))
+        lines, self._lines = self._lines, []
+        _writer.submit(_append, self.path, lines)
+
+    def close(self):
+        """
+        Flush what's left; the write completes in the background.
+        """
+        self._flush()
+        print(f"Call recording saved to {self.path}")
+
+
+def _append(path: str, lines: list):
+    try:
+        with open(path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+    except OSError as e:
+        print(f"Error writing call recording {path}: {e}")
+
+
+def load_recording(path: str):
+    """
+    Returns (header, events) from a recording file.
+    """
+    with open(path) as f:
+        header = json.loads(f.readline())
+        events = [json.loads(line) for line in f if line.strip()]
+    if header.get("v") != RECORDING_FORMAT_VERSION:
+        raise ValueError(f"Unsupported recording version: {header.get('v')}")
+    return header, events
@@ -0,0 +1,125 @@
+# Production diagnostics: on-demand sampling profiler and event-loop stall watchdog
+from datetime import datetime, timezone
+from collections import Counter, deque
+import weakref
+import threading
+import traceback
+import asyncio
+import time
+import sys
+import os
+
+# Task -> CallSid, so a stall can be attributed to the call whose handler blocked the loop
+_task_calls = weakref.WeakKeyDictionary()
+
+
+def tag_call(call_sid: str):
+    """
+    Mark the current asyncio task as working on `call_sid`.
+    """
+    task = asyncio.current_task()
+    if task is not None and call_sid:
+        _task_calls[task] = call_sid
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_profile(seconds: float, interval: float) -> str:
+    """
+    Sample every thread's Python stack for `seconds` and return the counts in
+    collapsed-stack format ("thread;outer;...;inner count" per line), which
+    flamegraph.pl, speedscope and similar tools read directly.
+    Blocking: run it in a worker thread.
+    """
+    own = threading.get_ident()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    counts = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n"
+
+
+class LoopStallWatchdog:
+    """
+    Detects callbacks that block the event loop.
+    - A heartbeat coroutine stamps the time every `interval_ms`.
+    - A daemon thread checks the stamp. When it is older than `threshold_ms`, the loop is
+      stuck inside one callback, so the thread grabs the loop thread's stack right then
+      (the offending code is still on it) along with the CallSid tagged on the running task.
+    - When the loop recovers, the heartbeat fills in how long the stall really lasted.
+    Cost while healthy: one short sleep/wake per interval in each of the loop and the thread.
+    """
+
+    def __init__(self, threshold_ms: float = 250, interval_ms: float = 50, keep: int = 50):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.stalls = deque(maxlen=keep)
+        self._loop = None
+        self._loop_thread = None
+        self._beat = time.monotonic()
+        self._open_stall = None
+        self._stopped = threading.Event()
+        self._heartbeat_task = None
+
+    def start(self):
+        """
+        Call from the event loop being watched.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        threading.Thread(target=self._watch, name="loop-stall-watchdog", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            stall = self._open_stall
+            if stall is not None:
+                blocked = round((now - self._beat - self.interval) * 1000, 1)
+                stall["blockedMs"] = max(stall["blockedMs"], blocked)
+                print(f"Event loop stall ended after {stall['blockedMs']} ms (CallSid={stall['callSid']})")
+                self._open_stall = None
+            self._beat = now
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval):
+            beat = self._beat
+            lag = time.monotonic() - beat - self.interval
+            if lag < self.threshold or self._open_stall is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            task = asyncio.current_task(self._loop)
+            stall = {
+                "at": datetime.now(timezone.utc).isoformat(),
+                "blockedMs": round(lag * 1000, 1),     # lower bound until the loop recovers
+                "callSid": _task_calls.get(task) if task is not None else None,
+                "task": task.get_name() if task is not None else None,
+                "stack": traceback.format_stack(frame) if frame is not None else [],
+            }
+            # Only publish if the loop is still stuck on the same beat
+            if self._beat == beat:
+                self._open_stall = stall
+                self.stalls.append(stall)
+                print(f"⚠️ Event loop blocked for >{stall['blockedMs']} ms "
+                      f"(CallSid={stall['callSid']}, task={stall['task']}):\n{''.join(stall['stack'])}")
@@ -0,0 +1,161 @@
+# Local FAQ retrieval: an in-memory BM25 inverted index answering common questions before Pinecone
+from collections import Counter, deque
+import statistics
+import math
+import json
+import re
+import os
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "if", "in", "is", "it", "me", "my", "of", "on", "or", "our", "so", "that", "the", "this",
+    "to", "we", "what", "when", "where", "which", "who", "why", "will", "with", "you", "your",
+    # Conversational filler callers wrap questions in
+    "about", "any", "could", "know", "like", "please", "tell", "there", "want", "would",
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(term: str) -> str:
+    """
+    Fold plurals onto the singular ("employees" -> "employee", "companies" -> "company",
+    "boxes" -> "box"), so callers needn't phrase a question the way the FAQ does.
+    """
+    if len(term) <= 3 or term.endswith(("ss", "us", "is")):
+        return term
+    if term.endswith("ies"):
+        return term[:-3] + "y"
+    if term.endswith(("sses", "xes", "zes", "ches", "shes")):
+        return term[:-2]
+    if term.endswith("s"):
+        return term[:-1]
+    return term
+
+
+def tokenize(text: str) -> list:
+    return [normalize(t) for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+class FaqMatch:
+    def __init__(self, entry: dict, score: float, confidence: float):
+        self.question = entry["question"]
+        self.answer = entry["answer"]
+        self.score = score
+        self.confidence = confidence
+
+
+class FaqIndex:
+    """
+    BM25 over FAQ entries ({"question", "answer", optional "keywords"}).
+    Question and keyword terms are weighted above answer terms.
+
+    `confidence` (0..1) is the product of two ratios:
+    - coverage: the best score divided by what the query would score if each of its terms
+      appeared once in an average-length entry. Words the FAQ has never seen count at the
+      highest idf, so off-topic questions score low.
+    - margin: how far the best entry is ahead of the runner-up, so vague questions that
+      match several entries equally score low.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    QUESTION_WEIGHT = 2
+
+    def __init__(self, entries: list):
+        self.entries = entries
+        self.postings = {}      # term -> [(entry id, term frequency)]
+        self.lengths = []
+        for doc_id, entry in enumerate(entries):
+            terms = (tokenize(entry["question"]) + tokenize(" ".join(entry.get("keywords", [])))) * self.QUESTION_WEIGHT
+            terms += tokenize(entry["answer"])
+            self.lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings.setdefault(term, []).append((doc_id, tf))
+
+        n = len(entries)
+        self.avg_length = (sum(self.lengths) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+        self.unseen_idf = math.log(1 + (n + 0.5) / 0.5)
+
+    @classmethod
+    def from_file(cls, path: str) -> "FaqIndex":
+        with open(path) as f:
+            entries = json.load(f)
+        for entry in entries:
+            if not entry.get("question") or not entry.get("answer"):
+                raise ValueError(f"FAQ entry needs a question and an answer: {entry}")
+        return cls(entries)
+
+    def search(self, question: str):
+        """
+        Returns the best FaqMatch, or None if no entry shares a term with the question.
+        """
+        terms = set(tokenize(question or ""))
+        if not terms or not self.entries:
+            return None
+
+        scores = {}
+        for term in terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = self.K1 * (1 - self.B + self.B * self.lengths[doc_id] / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.K1 + 1) / (tf + norm)
+        if not scores:
+            return None
+
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        best = scores[ranked[0]]
+        runner_up = scores[ranked[1]] if len(ranked) > 1 else 0.0
+        ideal = sum(self.idf.get(term, self.unseen_idf) for term in terms)
+        confidence = min(1.0, best / ideal) * (1 - runner_up / best)
+        return FaqMatch(self.entries[ranked[0]], best, confidence)
+
+
+class TierStats:
+    """
+    Request count, hit count and recent latencies for one answer tier.
+    """
+
+    def __init__(self, keep: int = 1000):
+        self.requests = 0
+        self.hits = 0
+        self.latencies_ms = deque(maxlen=keep)
+
+    def record(self, ms: float, hit: bool = True):
+        self.requests += 1
+        self.hits += hit
+        self.latencies_ms.append(ms)
+
+    def as_dict(self) -> dict:
+        ordered = sorted(self.latencies_ms)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3) if ordered else None
+        return {
+            "requests": self.requests,
+            "hits": self.hits,
+            "hitRate": round(self.hits / self.requests, 3) if self.requests else None,
+            "latencyMs": {
+                "p50": pick(0.50),
+                "p95": pick(0.95),
+                "max": round(ordered[-1], 3) if ordered else None,
+                "mean": round(statistics.fmean(ordered), 3) if ordered else None,
+            },
+        }
+
+
+def load_faq_index(path: str):
+    """
+    Build the index from `path`, or return None (tier disabled) if the file is missing.
+    Raises if the file is invalid.
+    """
+    if not path or not os.path.exists(path):
+        print(f"FAQ file {path} not found, local FAQ tier disabled")
+        return None
+    index = FaqIndex.from_file(path)
+    print(f"Built FAQ index from {path}: {len(index.entries)} entries, {len(index.postings)} terms")
+    return index
@@ -1,12 +1,19 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Response
-from pinecone_plugins.assistant.models.chat import Message
-from fastapi.responses import Response
+from fastapi.responses import Response, JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager
+from agent_profiles import ProfileRegistry
+from call_recorder import CallRecorder
+from call_log import CallLog
+from faq_index import TierStats
+from resampler import PolyphaseResampler
 from prompts import SYSTEM_MESSAGE
 from dotenv import load_dotenv
-from twilio.rest import Client
 from datetime import datetime
-from pinecone import Pinecone
 import websockets
+import diagnostics
+import warmup
+import hmac
+import time
 import traceback
 import requests
 import audioop
@@ -15,7 +22,7 @@ import base64
 import json
 import os
 
-load_dotenv(override=True)
+load_dotenv(os.environ.get('ENV_FILE'), override=True)
 
 # Get environment variables
 ULTRAVOX_API_KEY = os.environ.get('ULTRAVOX_API_KEY')
@@ -26,21 +33,151 @@ PORT = int(os.environ.get('PORT', '8000'))
 TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
 TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER')
+AGENT_PROFILES_FILE = os.environ.get('AGENT_PROFILES_FILE', 'agent_profiles.json')
+WARM_START = os.environ.get('WARM_START', 'true').lower() not in ('0', 'false', 'no')
+
+RECORD_CALLS_DIR = os.environ.get('RECORD_CALLS_DIR')  # Opt-in: record every call's event stream here
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')  # Enables /admin/* endpoints when set
+LOOP_STALL_THRESHOLD_MS = float(os.environ.get('LOOP_STALL_THRESHOLD_MS', '250'))  # 0 disables the watchdog
+CALL_LOG_DB = os.environ.get('CALL_LOG_DB', 'calls.db')
+FAQ_MIN_CONFIDENCE = float(os.environ.get('FAQ_MIN_CONFIDENCE', '0.6'))  # Below this, ask Pinecone
+
+ULTRAVOX_API_URL = os.environ.get('ULTRAVOX_API_URL', "https://api.ultravox.ai/api/calls")
+TWILIO_API_URL = "https://api.twilio.com"
+PINECONE_API_URL = "https://api.pinecone.io"
+PINECONE_ASSISTANT_NAME = "rag-tool"
 
 # Ultravox defaults
 ULTRAVOX_MODEL         = "fixie-ai/ultravox-70B"
 ULTRAVOX_VOICE         = "Tanya-English"   # or “Mark”
-ULTRAVOX_SAMPLE_RATE   = 8000        
+ULTRAVOX_SAMPLE_RATE   = int(os.environ.get('ULTRAVOX_SAMPLE_RATE', '8000'))   # e.g. 16000 or 24000 for wideband
+ULTRAVOX_INPUT_SAMPLE_RATE  = int(os.environ.get('ULTRAVOX_INPUT_SAMPLE_RATE', ULTRAVOX_SAMPLE_RATE))
+ULTRAVOX_OUTPUT_SAMPLE_RATE = int(os.environ.get('ULTRAVOX_OUTPUT_SAMPLE_RATE', ULTRAVOX_SAMPLE_RATE))
 ULTRAVOX_BUFFER_SIZE   = 60        
 
+# Twilio Media Streams are always 8kHz G.711 µ-law
+TWILIO_SAMPLE_RATE     = 8000
+
 CALENDARS_LIST = {
             "LOCATION1": "CALENDAR_EMAIL1",
             "LOCATION2": "CALENDAR_EMAIL2",
             "LOCATION3": "CALENDAR_EMAIL3",
             # Add more locations / Calendar IDs as needed
         }
+
+# Agent profiles, selected per call by campaign or called Twilio number.
+# Values here are used for anything a profile in AGENT_PROFILES_FILE leaves out.
+AGENT_PROFILES = ProfileRegistry(
+    AGENT_PROFILES_FILE,
+    defaults={
+        "model": ULTRAVOX_MODEL,
+        "voice": ULTRAVOX_VOICE,
+        "temperature": 0.1,
+        "systemPrompt": SYSTEM_MESSAGE,
+        "firstMessage": "Hey, this is Sara from Agenix AI solutions. How can I assist you today?",
+        "calendars": CALENDARS_LIST,
+    },
+    medium={
+        "serverWebSocket": {
+            "inputSampleRate": ULTRAVOX_INPUT_SAMPLE_RATE,
+            "outputSampleRate": ULTRAVOX_OUTPUT_SAMPLE_RATE,
+            "clientBufferSizeMs": ULTRAVOX_BUFFER_SIZE
+        }
+    },
+)
+
+# Per-tier stats for question_and_answer: each profile's local FAQ (see `faqFile`), then Pinecone
+qa_stats = {"faq": TierStats(), "pinecone": TierStats()}
+
+# Call status / session log, written behind in batches
+call_log = CallLog(CALL_LOG_DB)
+
+# Shared HTTP session so Ultravox / N8N requests reuse pooled keep-alive connections
+http = requests.Session()
+
+# Heavy SDK clients, imported and built on first use (or by the startup warm-up).
+# Building them blocks (imports, and the Pinecone assistant is looked up over the network),
+# so async handlers call these through asyncio.to_thread. There is no lock: if two threads
+# race on first use, one client is simply discarded.
+_twilio_client = None
+_pinecone_assistant = None
+
+def get_twilio_client():
+    global _twilio_client
+    if _twilio_client is None:
+        from twilio.rest import Client
+        _twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    return _twilio_client
+
+def get_pinecone_assistant():
+    global _pinecone_assistant
+    if _pinecone_assistant is None:
+        from pinecone import Pinecone
+        pc = Pinecone(api_key=PINECONE_API_KEY)
+        _pinecone_assistant = pc.assistant.Assistant(assistant_name=PINECONE_ASSISTANT_NAME)
+    return _pinecone_assistant
+
+def ask_pinecone(question: str) -> str:
+    """
+    Ask the Pinecone assistant and collect the streamed answer. Blocking from the
+    import on, so call it through asyncio.to_thread.
+    """
+    from pinecone_plugins.assistant.models.chat import Message
+    chunks = get_pinecone_assistant().chat(messages=[Message(content=question)], stream=True)
+    answer = ""
+    for chunk in chunks:
+        if chunk and chunk.type == "content_chunk":
+            answer += chunk.delta.content
+    return answer
+
+#
+# Startup warm-up: import SDKs, resolve and pre-connect outbound hosts, then flip /ready
+#
+warmup_state = warmup.WarmupState()
+
+async def warm_up():
+    await warmup_state.run("import_sdks", warmup.import_modules,
+                           "twilio.rest", "pinecone", "pinecone_plugins.assistant.models.chat")
+
+    urls = [ULTRAVOX_API_URL, N8N_WEBHOOK_URL, TWILIO_API_URL, PINECONE_API_URL]
+    hosts = {warmup.hostname(url) for url in urls if url} - {None}
+    await asyncio.gather(*(warmup_state.run(f"resolve:{host}", warmup.resolve, host) for host in hosts))
+
+    steps = [warmup_state.run("connect:ultravox", warmup.preconnect, http, ULTRAVOX_API_URL)]
+    if warmup.hostname(N8N_WEBHOOK_URL):
+        steps.append(warmup_state.run("connect:n8n", warmup.preconnect, http, N8N_WEBHOOK_URL))
+    if TWILIO_ACCOUNT_SID:
+        steps.append(warmup_state.run("connect:twilio", lambda: warmup.preconnect(
+            get_twilio_client().http_client.session, TWILIO_API_URL)))
+    if PINECONE_API_KEY:
+        steps.append(warmup_state.run("pinecone_assistant", lambda: warmup.resolve(
+            warmup.hostname(get_pinecone_assistant().host))))
+    await asyncio.gather(*steps)
+    warmup_state.mark_ready()
+
+# Always-on detector for callbacks that block the event loop
+stall_watchdog = diagnostics.LoopStallWatchdog(threshold_ms=LOOP_STALL_THRESHOLD_MS or 250)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if LOOP_STALL_THRESHOLD_MS > 0:
+        stall_watchdog.start()
+    call_log.start()
+    profile_watcher = asyncio.create_task(AGENT_PROFILES.watch())
+    # Warm up in the background so the port opens immediately; /ready reports when it's done
+    task = None
+    if WARM_START:
+        task = asyncio.create_task(warm_up())
+    else:
+        warmup_state.mark_ready()
+    yield
+    if task and not task.done():
+        task.cancel()
+    profile_watcher.cancel()
+    stall_watchdog.stop()
+    await call_log.stop()
                  
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Keep the same session store
 sessions = {}
@@ -58,6 +195,105 @@ LOG_EVENT_TYPES = [
 async def root():
     return {"message": "Twilio + Ultravox Media Stream Server is running!"}
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 503 until the startup warm-up has finished, then 200.
+    """
+    return JSONResponse(warmup_state.as_dict(), status_code=200 if warmup_state.ready else 503)
+
+#
+# Admin-only diagnostics (disabled unless ADMIN_TOKEN is set; send it as X-Admin-Token)
+#
+def is_admin(request: Request) -> bool:
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+profile_lock = asyncio.Lock()
+
+@app.get("/admin/profile")
+async def admin_profile(request: Request, seconds: float = 10, interval_ms: float = 10):
+    """
+    Sample all thread stacks for `seconds` (max 60) and return collapsed stacks
+    for flamegraph.pl / speedscope. One profile at a time.
+    """
+    if not is_admin(request):
+        return Response(status_code=404)
+    if profile_lock.locked():
+        return JSONResponse({"error": "A profile is already running"}, status_code=409)
+    async with profile_lock:
+        seconds = min(max(seconds, 0.1), 60)
+        interval = min(max(interval_ms, 1), 1000) / 1000
+        print(f"Sampling profile for {seconds}s every {interval * 1000:.0f} ms")
+        folded = await asyncio.to_thread(diagnostics.sample_profile, seconds, interval)
+    return PlainTextResponse(folded)
+
+@app.get("/admin/stalls")
+async def admin_stalls(request: Request):
+    """
+    Recent event-loop stalls, newest last, with the blocking stack and CallSid.
+    """
+    if not is_admin(request):
+        return Response(status_code=404)
+    return {"thresholdMs": LOOP_STALL_THRESHOLD_MS, "stalls": list(stall_watchdog.stalls)}
+
+@app.get("/admin/calls")
+async def admin_calls(request: Request, limit: int = 50, status: str = None):
+    """
+    Most recent calls from the local call log, newest first.
+    """
+    if not is_admin(request):
+        return Response(status_code=404)
+    return {"calls": await call_log.recent_calls(min(max(limit, 1), 1000), status)}
+
+@app.get("/admin/calls/stats")
+async def admin_call_stats(request: Request, hours: float = 24, since: str = None, until: str = None):
+    """
+    Throughput, answer rate and durations over a window: the last `hours`,
+    or `since` / `until` as ISO-8601 timestamps.
+    """
+    if not is_admin(request):
+        return Response(status_code=404)
+    try:
+        end = datetime.fromisoformat(until).timestamp() if until else time.time()
+        start = datetime.fromisoformat(since).timestamp() if since else end - hours * 3600
+    except ValueError as e:
+        return JSONResponse({"error": f"Invalid timestamp: {e}"}, status_code=400)
+    return await call_log.stats(start, end)
+
+def faq_entries() -> dict:
+    """
+    FAQ entry count per profile (0 where the profile has no FAQ).
+    """
+    return {name: len(profile.faq_index.entries) if profile.faq_index else 0
+            for name, profile in AGENT_PROFILES.profiles.items()}
+
+@app.post("/admin/faq/reload")
+async def admin_faq_reload(request: Request):
+    """
+    Reload the agent profiles, rebuilding each profile's FAQ index from its `faqFile`.
+    A broken profiles file leaves everything in place; a broken FAQ file keeps that
+    profile's current index and is listed under `faqErrors`.
+    """
+    if not is_admin(request):
+        return Response(status_code=404)
+    if not await asyncio.to_thread(AGENT_PROFILES.load):
+        return JSONResponse({"error": f"Could not reload agent profiles from {AGENT_PROFILES_FILE}"}, status_code=500)
+    return {"success": not AGENT_PROFILES.faq_errors, "entries": faq_entries(), "faqErrors": AGENT_PROFILES.faq_errors}
+
+@app.get("/admin/qa-stats")
+async def admin_qa_stats(request: Request):
+    """
+    Hit rate and latency of the local FAQ tier and of the Pinecone fallback.
+    """
+    if not is_admin(request):
+        return Response(status_code=404)
+    return {
+        "faqEntries": faq_entries(),
+        "minConfidence": FAQ_MIN_CONFIDENCE,
+        **{tier: stats.as_dict() for tier, stats in qa_stats.items()},
+    }
+
 @app.post("/incoming-call")
 async def incoming_call(request: Request):
     """
@@ -73,14 +309,18 @@ async def incoming_call(request: Request):
 
     caller_number = twilio_params.get('From', 'Unknown')
     session_id = twilio_params.get('CallSid')
+    diagnostics.tag_call(session_id)
+    # `?campaign=` on the webhook URL pins a profile (by campaign or name) regardless of the number
+    profile = AGENT_PROFILES.select(number=twilio_params.get('To'), campaign=request.query_params.get('campaign'))
     print('Caller Number:', caller_number)
     print('Session ID (CallSid):', session_id)
+    print('Agent profile:', profile.name)
 
     # Fetch first message from N8N
-    first_message = "Hey, this is Sara from Agenix AI solutions. How can I assist you today?"
+    first_message = profile.first_message
     print("Fetching N8N ...")
     try:
-        webhook_response = requests.post(
+        webhook_response = http.post(
             N8N_WEBHOOK_URL,
             headers={"Content-Type": "application/json"},
             json={
@@ -111,9 +351,15 @@ async def incoming_call(request: Request):
         "callerNumber": caller_number,
         "callDetails": twilio_params,
         "firstMessage": first_message,
+        "profile": profile,
+        "direction": "inbound",
+        "calledNumber": twilio_params.get('To'),
+        "campaign": request.query_params.get('campaign'),
         "streamSid": None
     }
     sessions[session_id] = session
+    call_log.record(session_id, "created", direction="inbound", from_number=caller_number,
+                    to_number=twilio_params.get('To'), profile=profile.name)
 
     # Respond with TwiML to connect to /media-stream
     host = PUBLIC_URL
@@ -142,12 +388,16 @@ async def outgoing_call(request: Request):
         first_message = data.get('firstMessage')
         if not phone_number:
             return {"error": "Phone number is required"}, 400
+
+        profile = AGENT_PROFILES.select(number=TWILIO_PHONE_NUMBER, campaign=data.get('campaign'))
+        first_message = first_message or profile.first_message
         
         print('📞 Initiating outbound call to:', phone_number)
         print('📝 With the following first message:', first_message)
+        print('🧑 Agent profile:', profile.name)
         
-        # Initialize Twilio client
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+        # Twilio client (built once, reused across calls)
+        client = await asyncio.to_thread(get_twilio_client)
 
         # Store call data
         call_data = {
@@ -160,7 +410,8 @@ async def outgoing_call(request: Request):
         stream_url = f"{host.replace('https', 'wss')}/media-stream"
         
         print('📱 Creating Twilio call with TWIML...')
-        call = client.calls.create(
+        call = await asyncio.to_thread(
+            client.calls.create,
             twiml=f'''<Response>
                         <Connect>
                             <Stream url="{stream_url}">
@@ -176,12 +427,18 @@ async def outgoing_call(request: Request):
         )
 
         print('📱 Twilio call created:', call.sid)
+        call_log.record(call.sid, "created", direction="outbound", from_number=TWILIO_PHONE_NUMBER,
+                        to_number=phone_number, profile=profile.name)
         # Store call data in sessions
         sessions[call.sid] = {
             "transcript": "",
             "callerNumber": phone_number,
             "callDetails": call_data,
             "firstMessage": first_message,
+            "profile": profile,
+            "direction": "outbound",
+            "calledNumber": phone_number,
+            "campaign": data.get('campaign'),
             "streamSid": None
         }
 
@@ -211,16 +468,31 @@ async def media_stream(websocket: WebSocket):
     stream_sid = ''
     uv_ws = None  # Ultravox WebSocket connection
     twilio_task = None  # Store the Twilio handler task
+    recorder = CallRecorder(RECORD_CALLS_DIR) if RECORD_CALLS_DIR else None
+
+    # Per-call resamplers (they carry filter state between frames); None when rates match
+    to_ultravox = None
+    if ULTRAVOX_INPUT_SAMPLE_RATE != TWILIO_SAMPLE_RATE:
+        to_ultravox = PolyphaseResampler(TWILIO_SAMPLE_RATE, ULTRAVOX_INPUT_SAMPLE_RATE)
+    to_twilio = None
+    if ULTRAVOX_OUTPUT_SAMPLE_RATE != TWILIO_SAMPLE_RATE:
+        to_twilio = PolyphaseResampler(ULTRAVOX_OUTPUT_SAMPLE_RATE, TWILIO_SAMPLE_RATE)
 
     # Define handler for Ultravox messages
     async def handle_ultravox():
         nonlocal uv_ws, session, stream_sid, call_sid, twilio_task
+        diagnostics.tag_call(call_sid)
         try:
             async for raw_message in uv_ws:
+                if recorder:
+                    recorder.ultravox(raw_message)
                 if isinstance(raw_message, bytes):
                     # Agent audio in PCM s16le
                     try:
-                        mu_law_bytes = audioop.lin2ulaw(raw_message, 2)
+                        pcm_bytes = to_twilio.process(raw_message) if to_twilio else raw_message
+                        if not pcm_bytes:
+                            continue
+                        mu_law_bytes = audioop.lin2ulaw(pcm_bytes, 2)
                         payload_base64 = base64.b64encode(mu_law_bytes).decode('ascii')
                     except Exception as e:
                         print(f"Error transcoding PCM to µ-law: {e}")
@@ -266,12 +538,13 @@ async def media_stream(websocket: WebSocket):
                         toolName = msg_data.get("toolName", "")
                         invocationId = msg_data.get("invocationId")
                         parameters = msg_data.get("parameters", {})
+                        tool_started = time.perf_counter()
                         print(f"Invoking tool: {toolName} with invocationId: {invocationId} and parameters: {parameters}")
 
                         if toolName == "question_and_answer":
                             question = parameters.get('question')
                             print(f'Arguments passed to question_and_answer tool: {parameters}')
-                            await handle_question_and_answer(uv_ws, invocationId, question)
+                            await handle_question_and_answer(uv_ws, invocationId, question, session['profile'])
                         elif toolName == "schedule_meeting":
                             print(f'Arguments passed to schedule_meeting tool: {parameters}')
                             # Validate required parameters
@@ -303,6 +576,8 @@ async def media_stream(websocket: WebSocket):
                                 "response_type": "tool-response"
                             }
                             await uv_ws.send(json.dumps(tool_result))
+                            if recorder:
+                                recorder.tool(toolName, invocationId, tool_started)
                             
                             # End the call process:
                             print(f"Ending call (CallSid={call_sid})")
@@ -313,8 +588,8 @@ async def media_stream(websocket: WebSocket):
                             
                             # End Twilio call
                             try:
-                                client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-                                client.calls(call_sid).update(status='completed')
+                                client = await asyncio.to_thread(get_twilio_client)
+                                await asyncio.to_thread(client.calls(call_sid).update, status='completed')
                                 print(f"Successfully ended Twilio call: {call_sid}")
                             except Exception as e:
                                 print(f"Error ending Twilio call: {e}")
@@ -325,6 +600,9 @@ async def media_stream(websocket: WebSocket):
                                 sessions.pop(call_sid, None)
                             return  # Exit the Ultravox handler
 
+                        if recorder:
+                            recorder.tool(toolName, invocationId, tool_started)
+
                     elif msg_type == "state":
                         # Handle state messages
                         state = msg_data.get("state")
@@ -367,10 +645,13 @@ async def media_stream(websocket: WebSocket):
             while True:
                 message = await websocket.receive_text()
                 data = json.loads(message)
+                if recorder:
+                    recorder.twilio(data)
 
                 if data.get('event') == 'start':
                     stream_sid = data['start']['streamSid']
                     call_sid = data['start']['callSid']
+                    diagnostics.tag_call(call_sid)
                     custom_parameters = data['start'].get('customParameters', {})
 
                     print("Twilio event: start")
@@ -386,6 +667,17 @@ async def media_stream(websocket: WebSocket):
                         session = sessions[call_sid]
                         session['callerNumber'] = caller_number
                         session['streamSid'] = stream_sid
+                        if recorder:
+                            recorder.start(
+                                call_sid,
+                                callerNumber=caller_number,
+                                calledNumber=session['calledNumber'],
+                                direction=session['direction'],
+                                campaign=session['campaign'],
+                                profile=session['profile'].name,
+                                inputSampleRate=ULTRAVOX_INPUT_SAMPLE_RATE,
+                                outputSampleRate=ULTRAVOX_OUTPUT_SAMPLE_RATE,
+                            )
                     else:
                         print(f"Session not found for CallSid: {call_sid}")
                         await websocket.close()
@@ -393,10 +685,11 @@ async def media_stream(websocket: WebSocket):
 
                     print("Caller Number:", caller_number)
                     print("First Message:", first_message)
+                    call_log.record(call_sid, "session_start")
 
                     # Create Ultravox call with first_message
                     uv_join_url = await create_ultravox_call(
-                        system_prompt=SYSTEM_MESSAGE,
+                        profile=session['profile'],
                         first_message=first_message  # Pass the actual first_message here
                     )
 
@@ -409,6 +702,8 @@ async def media_stream(websocket: WebSocket):
                     try:
                         uv_ws = await websockets.connect(uv_join_url)
                         print("Ultravox WebSocket connected.")
+                        if recorder:
+                            recorder.ultravox_open()
                     except Exception as e:
                         print(f"Error connecting to Ultravox WebSocket: {e}")
                         traceback.print_exc()
@@ -432,8 +727,10 @@ async def media_stream(websocket: WebSocket):
                         continue  # Skip this payload
 
                     try:
-                        # Transcode µ-law to PCM (s16le)
+                        # Transcode µ-law to PCM (s16le) and resample to the Ultravox input rate
                         pcm_bytes = audioop.ulaw2lin(mu_law_bytes, 2)
+                        if to_ultravox:
+                            pcm_bytes = to_ultravox.process(pcm_bytes)
                         
                     except Exception as e:
                         print(f"Error transcoding µ-law to PCM: {e}")
@@ -473,6 +770,9 @@ async def media_stream(websocket: WebSocket):
         # Ensure everything is cleaned up
         if session and call_sid:
             sessions.pop(call_sid, None)
+            call_log.record(call_sid, "session_end")
+        if recorder:
+            recorder.close()
 
 
 #
@@ -483,13 +783,14 @@ async def call_status(request: Request):
     try:
         # Get form data
         data = await request.form()
-        print('\n=== 📱 Twilio Status Update ===')
-        print('Status:', data.get('CallStatus'))
-        print('Duration:', data.get('CallDuration'))
-        print('Timestamp:', data.get('Timestamp'))
-        print('Call SID:', data.get('CallSid'))
+        print(f"📱 Twilio status: {data.get('CallStatus')} (CallSid={data.get('CallSid')}, Duration={data.get('CallDuration')})")
         # print('Full status payload:', dict(data))
-        print('\n====== END ======')
+        duration = data.get('CallDuration')
+        call_log.record(
+            data.get('CallSid'), "status",
+            status=data.get('CallStatus'),
+            duration=int(duration) if duration and duration.isdigit() else None,
+        )
         
     except Exception as e:
         print(f"Error getting request data: {e}")
@@ -500,123 +801,23 @@ async def call_status(request: Request):
 #
 # Create an Ultravox serverWebSocket call
 #
-async def create_ultravox_call(system_prompt: str, first_message: str) -> str:
+async def create_ultravox_call(profile, first_message: str) -> str:
     """
     Creates a new Ultravox call in serverWebSocket mode and returns the joinUrl.
+    The request body comes pre-serialized from the agent profile.
     """
-    url = "https://api.ultravox.ai/api/calls"
+    url = ULTRAVOX_API_URL
     headers = {
         "X-API-Key": ULTRAVOX_API_KEY,
         "Content-Type": "application/json"
     }
 
-    payload = {
-        "systemPrompt": system_prompt,
-        "model": ULTRAVOX_MODEL,
-        "voice": ULTRAVOX_VOICE,
-        "temperature":0.1,
-        "initialMessages": [
-            {
-                "role": "MESSAGE_ROLE_USER",  
-                "text": first_message
-            }
-        ],
-        "medium": {
-            "serverWebSocket": {
-                "inputSampleRate": ULTRAVOX_SAMPLE_RATE,   
-                "outputSampleRate": ULTRAVOX_SAMPLE_RATE,   
-                "clientBufferSizeMs": ULTRAVOX_BUFFER_SIZE
-            }
-        },
-        "selectedTools": [  
-            {
-                "temporaryTool": {
-                    "modelToolName": "question_and_answer",
-                    "description": "Get answers to customer questions especially about AI employees",
-                    "dynamicParameters": [
-                        {
-                            "name": "question",
-                            "location": "PARAMETER_LOCATION_BODY",
-                            "schema": {
-                                "type": "string",
-                                "description": "Question to be answered"
-                            },
-                            "required": True
-                        }
-                    ],
-                    "timeout": "20s",
-                    "client": {},
-                },
-            },
-            {
-                "temporaryTool": {
-                    "modelToolName": "schedule_meeting",
-                    "description": "Schedule a meeting for a customer. Returns a message indicating whether the booking was successful or not.",
-                    "dynamicParameters": [
-                        {
-                            "name": "name",
-                            "location": "PARAMETER_LOCATION_BODY",
-                            "schema": {
-                                "type": "string",
-                                "description": "Customer's name"
-                            },
-                            "required": True
-                        },
-                        {
-                            "name": "email",
-                            "location": "PARAMETER_LOCATION_BODY",
-                            "schema": {
-                                "type": "string",
-                                "description": "Customer's email"
-                            },
-                            "required": True
-                        },
-                        {
-                            "name": "purpose",
-                            "location": "PARAMETER_LOCATION_BODY",
-                            "schema": {
-                                "type": "string",
-                                "description": "Purpose of the Meeting"
-                            },
-                            "required": True
-                        },
-                        {
-                            "name": "datetime",
-                            "location": "PARAMETER_LOCATION_BODY",
-                            "schema": {
-                                "type": "string",
-                                "description": "Meeting Datetime"
-                            },
-                            "required": True
-                        },
-                        {
-                            "name": "location",
-                            "location": "PARAMETER_LOCATION_BODY",
-                            "schema": {
-                                "type": "string",
-                                "enum": ["London", "Manchester", "Brighton"],
-                                "description": "Meeting location"
-                            },
-                            "required": True
-                        }
-                    ],
-                    "timeout": "20s",
-                    "client": {},
-                },
-            },
-            { "temporaryTool": {
-                "modelToolName": "hangUp",
-                "description": "End the call",
-                "client": {},
-                }
-            }
-        ]
-    }
+    payload = profile.render(first_message)
 
-    # print("Creating Ultravox call with payload:", json.dumps(payload, indent=2))  # Enhanced logging
+    # print("Creating Ultravox call with payload:", payload.decode())  # Enhanced logging
 
     try:
-        resp = requests.post(url, headers=headers, json=payload)
+        resp = http.post(url, headers=headers, data=payload)
         if not resp.ok:
             print("Ultravox create call error:", resp.status_code, resp.text)
             return ""
@@ -629,21 +830,30 @@ async def create_ultravox_call(system_prompt: str, first_message: str) -> str:
         return ""
 
 #
-# Handle "question_and_answer" via Pinecone
+# Handle "question_and_answer": local FAQ first, Pinecone when the FAQ isn't confident
 #
-async def handle_question_and_answer(uv_ws, invocationId: str, question: str):
+async def handle_question_and_answer(uv_ws, invocationId: str, question: str, profile):
+    if profile.faq_index:
+        started = time.perf_counter()
+        match = profile.faq_index.search(question)
+        hit = match is not None and match.confidence >= FAQ_MIN_CONFIDENCE
+        qa_stats["faq"].record((time.perf_counter() - started) * 1000, hit)
+        if hit:
+            print(f"FAQ answered (confidence {match.confidence:.2f}): {match.question}")
+            await uv_ws.send(json.dumps({
+                "type": "client_tool_result",
+                "invocationId": invocationId,
+                "result": match.answer,
+                "response_type": "tool-response"
+            }))
+            return
+
+    started = time.perf_counter()
+    recorded = False
     try:
-        pc = Pinecone(api_key=PINECONE_API_KEY)
-        assistant = pc.assistant.Assistant(assistant_name="rag-tool")
-
-        msg = Message(content=question)
-        chunks = assistant.chat(messages=[msg], stream=True)
-
-        # Collect entire answer
-        answer_message = ""
-        for chunk in chunks:
-            if chunk and chunk.type == "content_chunk":
-                answer_message += chunk.delta.content
+        answer_message = await asyncio.to_thread(ask_pinecone, question)
+        qa_stats["pinecone"].record((time.perf_counter() - started) * 1000)
+        recorded = True
 
         # Respond back to Ultravox
         tool_result = {
@@ -655,6 +865,8 @@ async def handle_question_and_answer(uv_ws, invocationId: str, question: str):
         await uv_ws.send(json.dumps(tool_result))
     except Exception as e:
         print(f"Error in Q&A tool: {e}")
+        if not recorded:
+            qa_stats["pinecone"].record((time.perf_counter() - started) * 1000, hit=False)
         # Send error result back to Ultravox
         error_result = {
             "type": "client_tool_result",
@@ -684,7 +896,7 @@ async def handle_schedule_meeting(uv_ws, session, invocationId: str, parameters)
         if not all([name, email, purpose, datetime_str, location]):
             raise ValueError("One or more required parameters are missing.")
         
-        calendars = CALENDARS_LIST
+        calendars = session["profile"].calendars
         calendar_id = calendars.get(location, None)
         if not calendar_id:
             raise ValueError(f"Invalid location: {location}")
@@ -754,7 +966,7 @@ async def send_to_webhook(payload):
         print(f"Sending payload to N8N webhook: {N8N_WEBHOOK_URL}")
         print(f"Payload: {json.dumps(payload, indent=2)}")
         
-        response = requests.post(
+        response = http.post(
             N8N_WEBHOOK_URL,
             json=payload,
             headers={"Content-Type": "application/json"}
@@ -1,8 +1,7 @@
 # System message template for the AI assistant's behavior and persona
-import datetime
-now = datetime.datetime.now(datetime.UTC).strftime('%Y-%m-%d %H:%M:%S')
+# `{now}` is replaced with the current UTC time when each call is created (see agent_profiles.py)
 
-SYSTEM_MESSAGE = f"""
+SYSTEM_MESSAGE = """
 ### Role
 You are an AI assistant named Sarah, working at Agenix AI Solutions. Your role is to answer customer questions about AI agents and solutions and assist with scheduling meeting appointments at different locations
 ### Persona
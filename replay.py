@@ -0,0 +1,338 @@
+#
+# Replay a recorded call (see call_recorder.py) through the app against local stand-ins
+# for Ultravox and N8N, and report audio forwarding latency, tool round trips and app CPU.
+#
+# Usage:
+#   python replay.py recordings/20250101T120000-CA123.jsonl                   # real time
+#   python replay.py REC --speed 4 --out new.json                             # 4x faster, save report
+#   python replay.py REC --app-dir ../jadid-main --out base.json              # replay against another checkout
+#   python replay.py REC --compare base.json                                  # diff against a saved report
+#
+# Replay is open loop: Twilio events and Ultravox messages are sent on their recorded
+# schedule, not in reaction to what the app does. Pinecone is not stubbed (PINECONE_API_KEY
+# is blanked), so `question_and_answer` fails fast and its round trip isn't comparable.
+#
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
+from call_recorder import load_recording
+from collections import deque
+import subprocess
+import statistics
+import websockets
+import argparse
+import requests
+import asyncio
+import uvicorn
+import socket
+import time
+import json
+import sys
+import os
+
+
+class ReplayState:
+    """
+    Timestamps shared between the Twilio-side driver and the Ultravox stand-in.
+    """
+
+    def __init__(self, header: dict, events: list, speed: float):
+        self.header = header
+        self.speed = speed
+        self.twilio_events = [e for e in events if "tw" in e]
+        opened = next((e["t"] for e in events if e.get("uv") == "open"), 0.0)
+        self.ultravox_events = [
+            {**e, "t": e["t"] - opened} for e in events if e.get("uv") in ("audio", "msg")
+        ]
+        self.recorded_tools = [e for e in events if "tool" in e]
+        self.uplink_sent = deque()      # driver -> app (Twilio media), send times
+        self.downlink_sent = deque()    # stand-in -> app (Ultravox audio), send times
+        self.tool_sent = {}             # invocationId -> (toolName, send time)
+        self.uplink_ms = []
+        self.downlink_ms = []
+        self.tool_ms = {}
+        self.ultravox_done = asyncio.Event()
+        self.transcript_posted = asyncio.Event()    # route "2": the app has finished tearing the call down
+
+
+def build_standins(state: ReplayState, base_url: str) -> FastAPI:
+    standins = FastAPI()
+
+    @standins.post("/api/calls")
+    async def create_call():
+        return {"joinUrl": f"{base_url.replace('http', 'ws')}/ultravox"}
+
+    @standins.post("/n8n")
+    async def n8n(request: Request):
+        payload = await request.json()
+        if payload.get("route") == "2":
+            state.transcript_posted.set()
+        return {"firstMessage": "Hello from the replay stand-in.", "message": "Meeting booked (replay stand-in)."}
+
+    @standins.websocket("/ultravox")
+    async def ultravox(websocket: WebSocket):
+        await websocket.accept()
+
+        async def receive():
+            try:
+                while True:
+                    message = await websocket.receive()
+                    now = time.perf_counter()
+                    if message.get("bytes") is not None and state.uplink_sent:
+                        state.uplink_ms.append((now - state.uplink_sent.popleft()) * 1000)
+                    elif message.get("text"):
+                        data = json.loads(message["text"])
+                        sent = state.tool_sent.pop(data.get("invocationId"), None)
+                        if data.get("type") == "client_tool_result" and sent:
+                            state.tool_ms.setdefault(sent[0], []).append((now - sent[1]) * 1000)
+                    elif message.get("type") == "websocket.disconnect":
+                        return
+            except (WebSocketDisconnect, RuntimeError):
+                return
+
+        receiver = asyncio.create_task(receive())
+        start = time.perf_counter()
+        try:
+            for event in state.ultravox_events:
+                await sleep_until(start, event["t"], state.speed)
+                if event["uv"] == "audio":
+                    state.downlink_sent.append(time.perf_counter())
+                    await websocket.send_bytes(bytes(event["n"]))
+                else:
+                    data = json.loads(event["raw"])
+                    if data.get("type") == "client_tool_invocation":
+                        state.tool_sent[data.get("invocationId")] = (data.get("toolName"), time.perf_counter())
+                    await websocket.send_text(event["raw"])
+        except (WebSocketDisconnect, RuntimeError):
+            pass  # The app hung up (hangUp tool) before the recording ended
+        finally:
+            state.ultravox_done.set()
+            await receiver
+
+    return standins
+
+
+async def sleep_until(start: float, t_ms: float, speed: float):
+    delay = start + t_ms / 1000 / speed - time.perf_counter()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+async def drive_twilio(state: ReplayState, app_url: str):
+    """
+    Play the recorded Twilio side: POST /incoming-call, then the media stream events.
+    Outbound calls can't be placed without Twilio, so every call comes in through
+    /incoming-call, pinned with `?campaign=` to the profile that handled the recording.
+    """
+    header = state.header
+    await asyncio.to_thread(requests.post, f"{app_url}/incoming-call", params={
+        "campaign": header.get("profile"),
+    }, data={
+        "CallSid": header.get("callSid"),
+        "From": header.get("callerNumber") or "Unknown",
+        "To": header.get("calledNumber") or "",
+    })
+
+    async with websockets.connect(f"{app_url.replace('http', 'ws')}/media-stream") as ws:
+        async def receive():
+            try:
+                async for message in ws:
+                    data = json.loads(message)
+                    if data.get("event") == "media" and state.downlink_sent:
+                        state.downlink_ms.append((time.perf_counter() - state.downlink_sent.popleft()) * 1000)
+            except websockets.exceptions.ConnectionClosed:
+                pass
+
+        receiver = asyncio.create_task(receive())
+        stream_sid = ""
+        start = time.perf_counter()
+        for event in state.twilio_events:
+            await sleep_until(start, event["t"], state.speed)
+            if event["tw"] == "media":
+                message = {"event": "media", "streamSid": stream_sid, "media": {"payload": event["p"]}}
+                state.uplink_sent.append(time.perf_counter())
+            else:
+                message = event["raw"]
+                if event["tw"] == "start":
+                    stream_sid = message["start"]["streamSid"]
+            try:
+                await ws.send(json.dumps(message))
+            except websockets.exceptions.ConnectionClosed:
+                break
+
+        try:
+            await asyncio.wait_for(state.ultravox_done.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            print("Ultravox stand-in never finished (did the app connect to it?)")
+        await asyncio.sleep(0.5)    # let in-flight frames land
+        await ws.close()
+        await receiver
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_cpu_seconds(pid: int) -> float:
+    """
+    utime + stime of a process from /proc (Linux).
+    """
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def summarize(samples: list) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 2),
+        "mean": round(statistics.fmean(ordered), 2),
+    }
+
+
+def git_revision(path: str) -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=path,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def replay(recording: str, app_dir: str, speed: float) -> dict:
+    header, events = load_recording(recording)
+    state = ReplayState(header, events, speed)
+
+    standin_port = free_port()
+    standin_url = f"http://127.0.0.1:{standin_port}"
+    server = uvicorn.Server(uvicorn.Config(build_standins(state, standin_url),
+                                           host="127.0.0.1", port=standin_port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+
+    app_port = free_port()
+    app_url = f"http://127.0.0.1:{app_port}"
+    env = {
+        **os.environ,
+        "ENV_FILE": os.devnull,
+        "PUBLIC_URL": app_url,
+        "ULTRAVOX_API_URL": f"{standin_url}/api/calls",
+        "N8N_WEBHOOK_URL": f"{standin_url}/n8n",
+        "PINECONE_API_KEY": "",
+        "TWILIO_ACCOUNT_SID": "",
+        "TWILIO_AUTH_TOKEN": "",
+        "WARM_START": "false",
+        "CALL_LOG_DB": ":memory:",
+        "ULTRAVOX_INPUT_SAMPLE_RATE": str(header.get("inputSampleRate", 8000)),
+        "ULTRAVOX_OUTPUT_SAMPLE_RATE": str(header.get("outputSampleRate", 8000)),
+    }
+    env.pop("RECORD_CALLS_DIR", None)
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(app_port), "--log-level", "warning"],
+        cwd=app_dir, env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(300):
+            try:
+                await asyncio.to_thread(requests.get, f"{app_url}/", timeout=1)
+                break
+            except requests.exceptions.ConnectionError:
+                await asyncio.sleep(0.1)
+        else:
+            raise RuntimeError("App under test did not start")
+
+        cpu_before = process_cpu_seconds(app.pid)
+        wall_start = time.perf_counter()
+        await drive_twilio(state, app_url)
+        wall = time.perf_counter() - wall_start
+        cpu = process_cpu_seconds(app.pid) - cpu_before
+
+        # The app posts the transcript to the N8N stand-in after the Twilio socket closes;
+        # terminating it before then would leave it blocked on a request nobody answers
+        try:
+            await asyncio.wait_for(state.transcript_posted.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            print("App never posted the transcript to the N8N stand-in")
+    finally:
+        # Wait off the loop: the stand-ins the app may still be calling run on it
+        app.terminate()
+        try:
+            await asyncio.to_thread(app.wait, 10)
+        except subprocess.TimeoutExpired:
+            print("App under test did not exit, killing it")
+            app.kill()
+            await asyncio.to_thread(app.wait)
+        server.should_exit = True
+        await server_task
+
+    call_seconds = (events[-1]["t"] / 1000) if events else 0.0
+    recorded_tools = {}
+    for event in state.recorded_tools:
+        recorded_tools.setdefault(event["tool"], []).append(event["ms"])
+    return {
+        "recording": recording,
+        "build": git_revision(app_dir),
+        "direction": header.get("direction"),
+        "profile": header.get("profile"),
+        "speed": speed,
+        "callSeconds": round(call_seconds, 1),
+        "wallSeconds": round(wall, 2),
+        "appCpuSeconds": round(cpu, 3),
+        "appCpuPercentOfCall": round(100 * cpu / call_seconds, 3) if call_seconds else None,
+        "uplinkMs": summarize(state.uplink_ms),
+        "downlinkMs": summarize(state.downlink_ms),
+        "toolMs": {name: summarize(ms) for name, ms in state.tool_ms.items()},
+        "recordedToolMs": {name: summarize(ms) for name, ms in recorded_tools.items()},
+    }
+
+
+def flatten(report: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def print_comparison(baseline: dict, current: dict):
+    print(f"\n=== {baseline.get('build')} (baseline) vs {current.get('build')} ===")
+    base, cur = flatten(baseline), flatten(current)
+    for key in sorted(set(base) | set(cur)):
+        # Skip what describes the recording rather than the build
+        if key.endswith(".count") or key.startswith("recordedToolMs.") or key in ("speed", "callSeconds"):
+            continue
+        b, c = base.get(key), cur.get(key)
+        change = f"{100 * (c - b) / b:+7.1f}%" if b and c is not None else ""
+        print(f"  {key:<34} {b if b is not None else '-':>12} {c if c is not None else '-':>12} {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded call against local stand-ins")
+    parser.add_argument("recording", help="JSONL file written with RECORD_CALLS_DIR set")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = real time, 4 = four times faster")
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)),
+                        help="checkout whose main.py is replayed against (default: this one)")
+    parser.add_argument("--out", help="write the report JSON here")
+    parser.add_argument("--compare", help="baseline report JSON to diff against")
+    args = parser.parse_args()
+
+    report = asyncio.run(replay(args.recording, args.app_dir, args.speed))
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Streaming polyphase resampler between Twilio's 8kHz audio and Ultravox PCM
+import math
+import numpy as np
+
+
+class PolyphaseResampler:
+    """
+    Rational-ratio (L/M) FIR resampler for s16le mono PCM.
+    - The windowed-sinc prototype filter is split into L phases once, at construction.
+    - Filter history and the fractional output position are kept across frames,
+      so consecutive frames resample as one continuous signal (no clicks at boundaries).
+    - Work buffers are preallocated and grown only when a larger frame arrives,
+      so steady-state frames do no numpy allocation besides the returned bytes.
+    """
+
+    def __init__(self, in_rate: int, out_rate: int, taps_per_phase: int = 16, max_frame: int = 1024):
+        g = math.gcd(in_rate, out_rate)
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.up = out_rate // g     # L
+        self.down = in_rate // g    # M
+
+        # Prototype low-pass at the upsampled rate, cut just below the lower Nyquist
+        num_taps = taps_per_phase * max(self.up, self.down)
+        num_taps += (-num_taps) % self.up
+        cutoff = 0.45 * min(in_rate, out_rate) / (in_rate * self.up)
+        n = np.arange(num_taps) - (num_taps - 1) / 2
+        prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(num_taps, 8.0)
+        prototype *= self.up / prototype.sum()
+
+        # phases[p] holds taps p, p+L, p+2L, ... reversed so it lines up with a
+        # forward-ordered window of input samples ending at the current sample
+        self.taps = num_taps // self.up
+        self.phases = np.ascontiguousarray(
+            prototype.reshape(self.taps, self.up).T[:, ::-1], dtype=np.float32
+        )
+
+        self._pos = 0       # next output position, in upsampled samples, relative to the frame start
+        self._odd = b""     # trailing byte of a frame that split an s16 sample
+        self._allocate(max_frame)
+
+    def _allocate(self, max_frame: int):
+        history = self.taps - 1
+        max_out = (max_frame * self.up) // self.down + 2
+        old = getattr(self, "_buf", None)
+        self._max_frame = max_frame
+        self._buf = np.zeros(history + max_frame, dtype=np.float32)
+        if old is not None:
+            self._buf[:history] = old[:history]
+        # all_windows[i] = the `taps` buffered samples ending at input index i (a view, no copy)
+        self._all_windows = np.lib.stride_tricks.sliding_window_view(self._buf, self.taps)
+        self._steps = np.arange(max_out, dtype=np.int64) * self.down
+        self._idx = np.empty(max_out, dtype=np.int64)
+        self._phase = np.empty(max_out, dtype=np.int64)
+        self._windows = np.empty((max_out, self.taps), dtype=np.float32)
+        self._coeffs = np.empty((max_out, self.taps), dtype=np.float32)
+        self._acc = np.empty(max_out, dtype=np.float32)
+        self._out = np.empty(max_out, dtype=np.int16)
+
+    def reset(self):
+        """
+        Drop filter history, e.g. when the stream is interrupted.
+        """
+        self._buf[:self.taps - 1] = 0
+        self._pos = 0
+        self._odd = b""
+
+    def process(self, pcm_bytes: bytes) -> bytes:
+        """
+        Resample one chunk of s16le PCM and return the resampled s16le PCM.
+        """
+        if self._odd:
+            pcm_bytes = self._odd + pcm_bytes
+            self._odd = b""
+        if len(pcm_bytes) % 2:
+            self._odd = pcm_bytes[-1:]
+            pcm_bytes = pcm_bytes[:-1]
+
+        samples = np.frombuffer(pcm_bytes, dtype=np.int16)
+        n = samples.size
+        if n == 0:
+            return b""
+        if n > self._max_frame:
+            self._allocate(n)
+
+        history = self.taps - 1
+        buf = self._buf
+        buf[history:history + n] = samples
+
+        # Outputs whose source sample falls inside this frame
+        count = max(0, -(-(n * self.up - self._pos) // self.down))
+        pos = self._idx[:count]
+        np.add(self._steps[:count], self._pos, out=pos)
+        phase = self._phase[:count]
+        np.remainder(pos, self.up, out=phase)
+        np.floor_divide(pos, self.up, out=pos)
+
+        windows = self._windows[:count]
+        coeffs = self._coeffs[:count]
+        np.take(self._all_windows, pos, axis=0, out=windows)
+        np.take(self.phases, phase, axis=0, out=coeffs)
+        np.multiply(windows, coeffs, out=windows)
+        acc = self._acc[:count]
+        np.sum(windows, axis=1, out=acc)
+
+        np.clip(acc, -32768, 32767, out=acc)
+        np.rint(acc, out=acc)
+        out = self._out[:count]
+        np.copyto(out, acc, casting="unsafe")
+
+        # Carry filter history and the fractional position into the next frame
+        buf[:history] = buf[n:n + history]
+        self._pos += count * self.down - n * self.up
+        return out.tobytes()
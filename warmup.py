@@ -0,0 +1,68 @@
+# Startup warm-up: background SDK imports, DNS pre-resolution and connection pre-opening
+from urllib.parse import urlsplit
+import importlib
+import asyncio
+import socket
+import time
+
+
+class WarmupState:
+    """
+    Readiness flag plus per-step timings (ms) and errors, reported by /ready.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.started_at = time.perf_counter()
+        self.steps = {}
+        self.errors = {}
+
+    async def run(self, name: str, func, *args):
+        """
+        Run one blocking warm-up step in a worker thread and record how long it took.
+        A failing step is logged and recorded; it never aborts the rest of the warm-up.
+        """
+        start = time.perf_counter()
+        try:
+            return await asyncio.to_thread(func, *args)
+        except Exception as e:
+            print(f"Warm-up step '{name}' failed: {e}")
+            self.errors[name] = str(e)
+        finally:
+            self.steps[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def mark_ready(self):
+        self.ready = True
+        self.steps["total"] = round((time.perf_counter() - self.started_at) * 1000, 1)
+        print(f"Warm-up complete in {self.steps['total']} ms: {self.steps}")
+
+    def as_dict(self) -> dict:
+        return {"ready": self.ready, "timingsMs": self.steps, "errors": self.errors}
+
+
+def import_modules(*names: str):
+    """
+    Import SDK modules so the first call that needs them finds them in sys.modules.
+    """
+    for name in names:
+        importlib.import_module(name)
+
+
+def hostname(url: str) -> str:
+    return urlsplit(url).hostname if url else None
+
+
+def resolve(host: str):
+    """
+    Pre-resolve a host so the system resolver cache is warm for the first real request.
+    """
+    socket.getaddrinfo(host, 443, type=socket.SOCK_STREAM)
+
+
+def preconnect(session, url: str):
+    """
+    Open a pooled keep-alive TLS connection to the host of `url` with a HEAD to its root.
+    The response status doesn't matter; the connection stays in the session's pool.
+    """
+    parts = urlsplit(url)
+    session.head(f"{parts.scheme}://{parts.netloc}/", timeout=5)